@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Freeze hepmc_to_GENSIM.py into a fully materialized cmsRun config
+#
+# Building the GEN-SIM process imports ~100 cfi modules (StandardSequences,
+# Geometry, MagneticField, ...), which costs several seconds per cmsRun
+# invocation.  Running this driver once on the submit host bakes the result
+# into a flat config that condor jobs execute directly, so the import cost is
+# paid once per campaign instead of once per job.
+#
+# Usage (inside a cmsenv shell):
+#   python3 freeze_config.py [--output frozen_gensim_cfg.py] [--pickle] \
+#       [cmsRun-style option=value ...]
+#
+# Any trailing option=value arguments are forwarded to the VarParsing in
+# hepmc_to_GENSIM.py (inputFiles/outputFile stay overridable at cmsRun time
+# via process.source / RAWSIMoutput edits, so freeze with representative
+# values).  The SHA256 of the dump is printed; comparing hashes across
+# option-varying freezes catches accidental input-dependent config branches.
+
+import argparse
+import hashlib
+import os
+import runpy
+import sys
+
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_CONFIG = os.path.join(CONFIG_DIR, "hepmc_to_GENSIM.py")
+
+
+def freeze(output, extra_options, write_pickle=False):
+    # VarParsing reads sys.argv, so forward the option=value arguments
+    sys.argv = [SOURCE_CONFIG] + list(extra_options)
+    namespace = runpy.run_path(SOURCE_CONFIG, run_name="__main__")
+    process = namespace["process"]
+
+    dump = process.dumpPython()
+    digest = hashlib.sha256(dump.encode()).hexdigest()
+
+    with open(output, "w") as f:
+        f.write(dump)
+    print("[OK] Frozen config written: {}".format(output))
+    print("[INFO] dumpPython SHA256: {}".format(digest))
+
+    if write_pickle:
+        import pickle
+        pickle_path = os.path.splitext(output)[0] + ".pkl"
+        with open(pickle_path, "wb") as f:
+            pickle.dump(process, f)
+        print("[OK] Pickled process written: {}".format(pickle_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Freeze hepmc_to_GENSIM.py into a flat cmsRun config")
+    parser.add_argument("--output", "-o", default="frozen_gensim_cfg.py",
+                        help="Frozen config filename (default: frozen_gensim_cfg.py)")
+    parser.add_argument("--pickle", action="store_true",
+                        help="Also write a pickled process next to the frozen config")
+    args, extra = parser.parse_known_args()
+    freeze(args.output, extra, write_pickle=args.pickle)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# Freeze ntuple_jjp_cfg.py / ntuple_jup_cfg.py into fully materialized configs
+#
+# The ntuple configs process.load GeometryRecoDB, Reconstruction_cff,
+# MagneticField and the full patSequences on every cmsRun invocation even
+# though runOnMC is the only flag that varies between jobs.  Freezing one
+# config per (analysis, MC/data) combination on the submit host removes that
+# multi-second import cost from every condor job.
+#
+# Usage (inside a cmsenv shell):
+#   python3 freeze_ntuple.py --analysis jjp --mc
+#   python3 freeze_ntuple.py --analysis jup --data
+#
+# Emits ntuple_<analysis>_frozen_<mc|data>_cfg.py next to the source config.
+# The SHA256 of the dump is printed so a frozen config can be diffed against
+# a freshly built dynamic one.
+
+import argparse
+import hashlib
+import os
+import runpy
+import sys
+
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def freeze(analysis, run_on_mc, extra_options):
+    source = os.path.join(CONFIG_DIR, "ntuple_{}_cfg.py".format(analysis))
+    flavor = "mc" if run_on_mc else "data"
+    output = os.path.join(CONFIG_DIR,
+                          "ntuple_{}_frozen_{}_cfg.py".format(analysis, flavor))
+
+    # VarParsing reads sys.argv, so forward runOnMC plus any extra options
+    sys.argv = [source, "runOnMC={}".format(run_on_mc)] + list(extra_options)
+    namespace = runpy.run_path(source, run_name="__main__")
+    process = namespace["process"]
+
+    dump = process.dumpPython()
+    with open(output, "w") as f:
+        f.write(dump)
+    print("[OK] Frozen config written: {}".format(output))
+    print("[INFO] dumpPython SHA256: {}".format(
+        hashlib.sha256(dump.encode()).hexdigest()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Freeze the ntuple configs into flat cmsRun configs")
+    parser.add_argument("--analysis", choices=["jjp", "jup"], default="jjp",
+                        help="Which analyzer config to freeze (default: jjp)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--mc", action="store_true", help="Freeze the MC flavor")
+    group.add_argument("--data", action="store_true", help="Freeze the data flavor")
+    args, extra = parser.parse_known_args()
+    freeze(args.analysis, args.mc, extra)
+
+
+if __name__ == "__main__":
+    main()
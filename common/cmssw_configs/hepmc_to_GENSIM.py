@@ -5,6 +5,8 @@
 # Usage:
 #   cmsRun hepmc_to_GENSIM.py inputFiles=file:input.hepmc outputFile=file:output.root maxEvents=-1
 
+import itertools
+
 import FWCore.ParameterSet.Config as cms
 from FWCore.ParameterSet.VarParsing import VarParsing
 
@@ -30,21 +32,28 @@ options.register('nThreads',
                  VarParsing.multiplicity.singleton,
                  VarParsing.varType.int,
                  "Number of threads")
+options.register('nConcurrentLumis',
+                 0,
+                 VarParsing.multiplicity.singleton,
+                 VarParsing.varType.int,
+                 "Concurrent luminosity blocks (0 = nThreads/2)")
 options.register('debugDump',
                  False,
                  VarParsing.multiplicity.singleton,
                  VarParsing.varType.bool,
                  "Dump event content and exit")
+options.register('verbose',
+                 False,
+                 VarParsing.multiplicity.singleton,
+                 VarParsing.varType.bool,
+                 "Print config-time diagnostics")
 options.parseArguments()
 
 # Normalize inputFiles in case nested lists sneak in from CLI parsing
-normalized_inputs = []
-for item in options.inputFiles:
-    if isinstance(item, (list, tuple)):
-        normalized_inputs.extend(item)
-    else:
-        normalized_inputs.append(item)
-options.inputFiles = normalized_inputs
+options.inputFiles = list(itertools.chain.from_iterable(
+    item if isinstance(item, (list, tuple)) else (item,)
+    for item in options.inputFiles
+))
 
 from Configuration.Eras.Era_Run3_cff import Run3
 
@@ -65,7 +74,8 @@ process.load('Configuration.StandardSequences.SimIdeal_cff')
 process.load('Configuration.StandardSequences.EndOfProcess_cff')
 process.load('Configuration.StandardSequences.FrontierConditions_GlobalTag_cff')
 
-print("[config] LHCTransport present after standard loads:", hasattr(process, 'LHCTransport'))
+if options.verbose:
+    print("[config] LHCTransport present after standard loads:", hasattr(process, 'LHCTransport'))
 
 # Max events
 process.maxEvents = cms.untracked.PSet(
@@ -116,13 +126,18 @@ process.RAWSIMoutput = cms.OutputModule("PoolOutputModule",
     SelectEvents = cms.untracked.PSet(
         SelectEvents = cms.vstring('generation_step')
     ),
-    compressionAlgorithm = cms.untracked.string('LZMA'),
-    compressionLevel = cms.untracked.int32(1),
+    # ZSTD decompresses roughly an order of magnitude faster than LZMA at a
+    # similar ratio, which pays off in every downstream RAW/RECO/MiniAOD job
+    # that reads this file (supported by ROOT >= 6.20 / CMSSW 12.4).
+    compressionAlgorithm = cms.untracked.string('ZSTD'),
+    compressionLevel = cms.untracked.int32(5),
     dataset = cms.untracked.PSet(
         dataTier = cms.untracked.string('GEN-SIM'),
         filterName = cms.untracked.string('')
     ),
-    eventAutoFlushCompressedSize = cms.untracked.int32(20971520),
+    # 128 MB flush window: fewer, larger baskets so downstream readers get
+    # bulk decompression instead of many per-basket round-trips.
+    eventAutoFlushCompressedSize = cms.untracked.int32(134217728),
     fileName = cms.untracked.string(options.outputFile),
     outputCommands = process.RAWSIMEventContent.outputCommands,
     splitLevel = cms.untracked.int32(0)
@@ -139,22 +154,23 @@ process.genstepfilter.triggerConditions = cms.vstring("generation_step")
 from Configuration.AlCa.GlobalTag import GlobalTag
 process.GlobalTag = GlobalTag(process.GlobalTag, '124X_mcRun3_2022_realistic_v12', '')
 
-# Vertex smearing for Run3
-from IOMC.EventVertexGenerators.VtxSmearedParameters_cfi import (
-    Realistic25ns13p6TeVEarly2022CollisionVtxSmearingParameters, 
-    VtxSmearedCommon
-)
-
 # Configure for HepMC input
 # MCFileSource registers an edm::HepMCProduct with module label "source" and
 # instance label "generator" (see EventContentAnalyzer debug above).
 process.genParticles.src = cms.InputTag("source", "generator")
-VtxSmearedCommon.src = cms.InputTag("source", "generator")
 
-process.VtxSmeared = cms.EDProducer("BetafuncEvtVtxGenerator",
-    Realistic25ns13p6TeVEarly2022CollisionVtxSmearingParameters,
-    VtxSmearedCommon
-)
+# Vertex smearing for Run3 (pointless when only dumping event content)
+if not options.debugDump:
+    from IOMC.EventVertexGenerators.VtxSmearedParameters_cfi import (
+        Realistic25ns13p6TeVEarly2022CollisionVtxSmearingParameters,
+        VtxSmearedCommon
+    )
+    VtxSmearedCommon.src = cms.InputTag("source", "generator")
+
+    process.VtxSmeared = cms.EDProducer("BetafuncEvtVtxGenerator",
+        Realistic25ns13p6TeVEarly2022CollisionVtxSmearingParameters,
+        VtxSmearedCommon
+    )
 
 # Path and EndPath definitions
 process.generation_step = cms.Path(process.pgen)
@@ -172,35 +188,49 @@ process.schedule = cms.Schedule(
     process.RAWSIMoutput_step
 )
 
-from PhysicsTools.PatAlgos.tools.helpers import associatePatAlgosToolsTask
-associatePatAlgosToolsTask(process)
+# Both helpers below walk the whole process; skip them in debugDump mode
+# where the schedule is reduced to the EventContentAnalyzer path anyway
+if not options.debugDump:
+    from PhysicsTools.PatAlgos.tools.helpers import associatePatAlgosToolsTask
+    associatePatAlgosToolsTask(process)
+
+    from Configuration.DataProcessing.Utils import addMonitoring
+    process = addMonitoring(process)
 
 # Multithreading
 process.options.numberOfThreads = options.nThreads
 process.options.numberOfStreams = options.nThreads
-
-# Customization
-from Configuration.DataProcessing.Utils import addMonitoring
-process = addMonitoring(process)
+# Keep several lumis in flight so the begin/end-lumi barrier does not
+# serialize the streams at high thread counts
+process.options.numberOfConcurrentLuminosityBlocks = cms.untracked.uint32(
+    options.nConcurrentLumis if options.nConcurrentLumis > 0
+    else max(1, options.nThreads // 2)
+)
 
 # Fix for HepMC input - remove LHCTransport if present
-if hasattr(process, 'LHCTransport'):
+try:
     del process.LHCTransport
-print("[config] LHCTransport present after cleanup:", hasattr(process, 'LHCTransport'))
-
-# Ensure g4SimHits reads from the MCFileSource product
-if hasattr(process.g4SimHits, 'LHCTransport'):
-    process.g4SimHits.LHCTransport = False
-if hasattr(process.g4SimHits, 'theLHCTlinkTag'):
-    process.g4SimHits.theLHCTlinkTag = cms.InputTag('source', 'generator')
-if hasattr(process.g4SimHits.Generator, 'LHCTransport'):
-    process.g4SimHits.Generator.LHCTransport = False
-if hasattr(process.g4SimHits.Generator, 'theLHCTlinkTag'):
-    process.g4SimHits.Generator.theLHCTlinkTag = cms.InputTag('source', 'generator')
-process.g4SimHits.Generator.HepMCProductLabel = cms.InputTag('source', 'generator')
-print("[config] g4SimHits HepMCProductLabel:", process.g4SimHits.Generator.HepMCProductLabel)
-if hasattr(process.g4SimHits.Generator, 'LHCTransport'):
-    print("[config] g4SimHits Generator LHCTransport flag:", process.g4SimHits.Generator.LHCTransport)
+except AttributeError:
+    pass
+
+# Ensure g4SimHits reads from the MCFileSource product.  The transport knobs
+# moved between the module and its Generator PSet across releases, so probe
+# both levels once instead of scattering hasattr checks through the Process.
+g4gen = process.g4SimHits.Generator
+for holder in (process.g4SimHits, g4gen):
+    for attr, value in (('LHCTransport', False),
+                        ('theLHCTlinkTag', cms.InputTag('source', 'generator'))):
+        try:
+            getattr(holder, attr)
+        except AttributeError:
+            continue
+        setattr(holder, attr, value)
+g4gen.HepMCProductLabel = cms.InputTag('source', 'generator')
+if options.verbose:
+    print("[config] LHCTransport present after cleanup:", hasattr(process, 'LHCTransport'))
+    print("[config] g4SimHits HepMCProductLabel:", g4gen.HepMCProductLabel)
+    if hasattr(g4gen, 'LHCTransport'):
+        print("[config] g4SimHits Generator LHCTransport flag:", g4gen.LHCTransport)
 
 # Debug: optionally dump event content only
 if options.debugDump:
@@ -210,8 +240,10 @@ if options.debugDump:
     if hasattr(process.g4SimHits.Generator, 'theLHCTlinkTag'):
         print("[debugDump] g4SimHits.Generator theLHCTlinkTag:", process.g4SimHits.Generator.theLHCTlinkTag)
     print("[debugDump] g4SimHits.Generator PSets:\n", process.g4SimHits.Generator.dumpPython())
-    print("[debugDump] Does g4SimHits dump reference LHCTransport?:", "LHCTransport" in process.g4SimHits.dumpPython())
-    for line in process.g4SimHits.dumpPython().splitlines():
+    # dumpPython re-serializes the whole module PSet; do it once and reuse
+    g4dump = process.g4SimHits.dumpPython()
+    print("[debugDump] Does g4SimHits dump reference LHCTransport?:", "LHCTransport" in g4dump)
+    for line in g4dump.splitlines():
         if "LHCTransport" in line:
             print("[debugDump] g4SimHits contains:", line)
     process.dumpContent = cms.EDAnalyzer("EventContentAnalyzer")
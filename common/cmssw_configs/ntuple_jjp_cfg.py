@@ -42,7 +42,7 @@ process = cms.Process("mkcands")
 process.load("FWCore.MessageService.MessageLogger_cfi")
 process.MessageLogger.suppressInfo = cms.untracked.vstring("mkcands")
 process.MessageLogger.suppressWarning = cms.untracked.vstring("mkcands")
-process.MessageLogger.cerr.FwkReport.reportEvery = 100
+process.MessageLogger.cerr.FwkReport.reportEvery = 1000
 
 # Geometry and conditions
 process.load("TrackingTools/TransientTrack/TransientTrackBuilder_cfi")
@@ -65,9 +65,13 @@ else:
     process.GlobalTag = GlobalTag(process.GlobalTag, '124X_dataRun3_PromptAnalysis_v1', '')
 
 # Input source
+# The MiniAOD usually sits on remote (xrootd) storage and the analyzer's
+# branch access is not sequential, so give the TTreeCache a generous window
+# to hide the network round-trips.
 process.source = cms.Source("PoolSource",
     skipEvents = cms.untracked.uint32(0),
     fileNames = cms.untracked.vstring(ivars.inputFiles),
+    cacheSize = cms.untracked.uint32(100*1024*1024),
 )
 
 # Output module (for debugging, usually not used)
@@ -18,25 +18,54 @@ Date: 2024
 """
 
 import argparse
+import collections
+import contextlib
+import functools
+import itertools
+import json
+import logging
+import multiprocessing
 import os
+import queue
+import subprocess
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
 # Python 3.6 compatibility
 try:
-    from typing import Dict, List, Tuple, Optional
+    from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Sequence
 except ImportError:
     pass
 
+try:
+    import htcondor
+except ImportError:
+    # Only needed for --direct-submit; the DAG-file path works without it
+    htcondor = None
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+except ImportError:
+    # Fallback: check_proxy_valid shells out to voms-proxy-info instead
+    x509 = None
+
 try:
     from dataclasses import dataclass, field
 except ImportError:
-    # Fallback for Python < 3.7 - install dataclasses package or use simple classes
-    print("Note: dataclasses not available, using fallback implementation")
-    def dataclass(cls):
-        return cls
-    def field(**kwargs):
-        return kwargs.get('default', None)
+    # Python < 3.7 needs the backport now that the record classes rely on
+    # generated __init__ methods
+    sys.exit("dataclasses module required (pip install dataclasses on Python 3.6)")
+
+if sys.version_info >= (3, 10):
+    # slots=True packs instances into a fixed layout (no per-instance
+    # __dict__); older interpreters just lose the memory savings
+    _slotted_dataclass = functools.partial(dataclass, slots=True)
+else:
+    _slotted_dataclass = dataclass
 
 # =============================================================================
 # Configuration Constants
@@ -53,36 +82,50 @@ EXISTING_LHE_POOLS = {
     "pool_gg": "/eos/user/x/xcheng/learn_MC/gggg_g_pt4",
 }
 
+# T2 storage (IHEP EOS) hosting the shared LHE pools
+EOS_HOST = "root://eos01.ihep.ac.cn"
+EOS_PATH_BASE = "/eos/ihep/cms/store/user/xcheng/MC_Production_v2"
+
 # =============================================================================
 # Data Classes (Python 3.6 compatible)
 # =============================================================================
 
+@_slotted_dataclass
 class LHEPool:
-    """Definition of an LHE pool"""
-    def __init__(self, name, process, description, 
-                 output_pattern="sample_{name}_{seed}.lhe",
-                 min_pt_conia=6.0, min_pt_bonia=2.0, min_pt_q=4.0, 
-                 eos_path=None):
-        self.name = name
-        self.process = process
-        self.description = description
-        self.output_pattern = output_pattern
-        self.min_pt_conia = min_pt_conia
-        self.min_pt_bonia = min_pt_bonia
-        self.min_pt_q = min_pt_q
-        self.eos_path = eos_path
+    """Definition of an LHE pool.
+
+    Stays mutable (not frozen) because the T2 scan reassigns eos_path on the
+    shared LHE_POOLS entries after construction.
+    """
+    name: str
+    process: str
+    description: str
+    output_pattern: str = "sample_{name}_{seed}.lhe"
+    min_pt_conia: float = 6.0
+    min_pt_bonia: float = 2.0
+    min_pt_q: float = 4.0
+    eos_path: Optional[str] = None
 
+@_slotted_dataclass
 class Campaign:
     """Definition of a physics campaign"""
-    def __init__(self, name, analysis_type, inputs, modes, description):
-        self.name = name
-        self.analysis_type = analysis_type
-        self.inputs = inputs
-        self.modes = modes
-        self.description = description
-        self.n_sources = len(inputs)
-        if len(modes) != len(inputs):
-            raise ValueError("Campaign {}: modes count must match inputs count".format(name))
+    name: str
+    analysis_type: str
+    inputs: List[str]
+    modes: List[str]
+    description: str
+    n_sources: int = field(init=False)
+    modes_str: str = field(init=False)
+    inputs_count: "collections.Counter" = field(init=False)
+
+    def __post_init__(self):
+        self.n_sources = len(self.inputs)
+        if len(self.modes) != len(self.inputs):
+            raise ValueError("Campaign {}: modes count must match inputs count".format(self.name))
+        # Both are immutable configuration; derive them once here instead of
+        # per job (modes_str) or per plan build (inputs_count)
+        self.modes_str = ",".join(self.modes)
+        self.inputs_count = collections.Counter(self.inputs)
 
 # =============================================================================
 # LHE Pool Definitions
@@ -201,171 +244,608 @@ CAMPAIGNS: Dict[str, Campaign] = {
     ),
 }
 
+# CLI dispatch and listings filter campaigns by analysis type on every call;
+# precompute the grouping once at import
+CAMPAIGNS_BY_TYPE: Dict[str, List[str]] = {
+    "JJP": [n for n, c in CAMPAIGNS.items() if c.analysis_type == "JJP"],
+    "JUP": [n for n, c in CAMPAIGNS.items() if c.analysis_type == "JUP"],
+    "ALL": list(CAMPAIGNS),
+}
+
+logger = logging.getLogger("dag_generator")
+
+# =============================================================================
+# T2 Pool Scanning
+# =============================================================================
+
+@contextlib.contextmanager
+def _queued_logging(active: bool):
+    """Funnel log records through a queue with a single emitter thread.
+
+    With many scan workers, direct handler writes serialize the threads on
+    the stdio lock; queueing the records costs the workers only an enqueue.
+    """
+    if not active:
+        yield
+        return
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    direct_handlers = root.handlers[:]
+    listener = QueueListener(log_queue, *direct_handlers)
+    root.handlers = [QueueHandler(log_queue)]
+    listener.start()
+    try:
+        yield
+    finally:
+        listener.stop()
+        root.handlers = direct_handlers
+
+def _proxy_file_path() -> str:
+    """Location of the X509 proxy file, honoring X509_USER_PROXY"""
+    return os.environ.get("X509_USER_PROXY", "/tmp/x509up_u{}".format(os.getuid()))
+
+@functools.lru_cache(maxsize=1)
+def _proxy_seconds_left() -> Optional[float]:
+    """Read the proxy expiry directly from the PEM file on disk.
+
+    The proxy is a plain X.509 certificate, so parsing notAfter locally is
+    much cheaper than forking voms-proxy-info (which loads OpenSSL plus the
+    VOMS libraries on every call).  Returns None if the PEM cannot be read,
+    in which case the caller falls back to voms-proxy-info.
+    """
+    if x509 is None:
+        return None
+    try:
+        with open(_proxy_file_path(), "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read(), default_backend())
+    except (OSError, ValueError):
+        return None
+    return (cert.not_valid_after - datetime.utcnow()).total_seconds()
+
+@functools.lru_cache(maxsize=1)
+def check_proxy_valid(min_hours: int = 1) -> bool:
+    """Check that a VOMS proxy exists with enough lifetime for xrootd access.
+
+    The answer is computed once per process; long-running callers that renew
+    the proxy should call check_proxy_valid.cache_clear() afterwards.
+    """
+    timeleft = _proxy_seconds_left()
+    if timeleft is not None:
+        return timeleft >= min_hours * 3600
+
+    try:
+        result = subprocess.run(["voms-proxy-info", "--timeleft"],
+                                capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    if result.returncode != 0:
+        return False
+    try:
+        timeleft = int(result.stdout.strip())
+    except ValueError:
+        return False
+    return timeleft >= min_hours * 3600
+
+@functools.lru_cache(maxsize=None)
+def list_all_pools(host: str = EOS_HOST, base_path: str = EOS_PATH_BASE) -> Dict[str, List[str]]:
+    """List every file under lhe_pools/ on the T2 with one recursive xrdfs call.
+
+    A single 'xrdfs ls -R' on the parent directory replaces one network
+    round-trip (plus fork/exec) per pool; the flat listing is bucketed by
+    pool name so per-pool queries become dict lookups.  The result is cached
+    for the process lifetime, so repeated campaign passes reuse the listing.
+    """
+    pool_base = "{}/lhe_pools".format(base_path)
+    try:
+        result = subprocess.run(["xrdfs", host, "ls", "-R", pool_base],
+                                capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.SubprocessError):
+        return {}
+    if result.returncode != 0:
+        return {}
+
+    pools: Dict[str, List[str]] = {}
+    prefix = pool_base.rstrip("/") + "/"
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if not line.startswith(prefix):
+            continue
+        pool_name, _, entry = line[len(prefix):].partition("/")
+        if entry:
+            pools.setdefault(pool_name, []).append(entry)
+    return pools
+
+def count_lhe_files_on_t2(pool_name: str) -> int:
+    """Count .lhe files for a pool using the cached bulk listing"""
+    entries = list_all_pools().get(pool_name, [])
+    return sum(1 for entry in entries if entry.endswith(".lhe"))
+
+def probe_pool_on_t2(pool_name: str) -> int:
+    """Count .lhe files for a single pool with a direct xrdfs probe.
+
+    Fallback for servers where the recursive listing in list_all_pools is
+    unavailable (or too deep to be practical).
+    """
+    pool_path = f"{EOS_PATH_BASE}/lhe_pools/{pool_name}"
+    try:
+        result = subprocess.run(["xrdfs", EOS_HOST, "ls", pool_path],
+                                capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    if result.returncode != 0:
+        return 0
+    # splitlines handles the trailing newline, and summing a generator avoids
+    # materializing the listing twice for large (10k+ file) pools
+    n_files = sum(1 for line in result.stdout.splitlines()
+                  if line.endswith('.lhe'))
+    logger.debug("probed %s: %d LHE files", pool_name, n_files)
+    return n_files
+
+def batch_probe_pools(pool_names: List[str]) -> Optional[Dict[str, int]]:
+    """Probe several pools over one xrdfs connection.
+
+    xrdfs reads commands from stdin when it is not a terminal, so all the ls
+    commands are sent through a single process and a single xroot control
+    channel instead of paying the TCP/TLS handshake once per pool.  Output
+    lines are full paths, so they bucket back to their pool without any
+    framing.  Returns None if the session cannot be run, letting the caller
+    fall back to per-pool probes.
+    """
+    pool_base = "{}/lhe_pools".format(EOS_PATH_BASE)
+    commands = "".join("ls {}/{}\n".format(pool_base, p) for p in pool_names)
+    try:
+        result = subprocess.run(["xrdfs", EOS_HOST], input=commands,
+                                capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    # A nonzero exit usually just means some pool does not exist yet (its ls
+    # failed) - exactly the case DAG generation cares about.  The listings
+    # that did succeed are still on stdout, and missing pools default to 0
+    # below; only a session that produced nothing at all is a failure.
+    if not result.stdout:
+        return None
+
+    counts = dict.fromkeys(pool_names, 0)
+    prefix = pool_base + "/"
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if not line.startswith(prefix) or not line.endswith(".lhe"):
+            continue
+        pool_name = line[len(prefix):].split("/", 1)[0]
+        if pool_name in counts:
+            counts[pool_name] += 1
+    return counts
+
+DEFAULT_SCAN_THREADS = 16
+
+# On-disk cache so repeated DAG regenerations (tweak jobs count, re-emit)
+# skip the T2 scan entirely while the entries are fresh
+POOL_COUNT_CACHE = os.path.expanduser("~/.cache/mc_prod/pool_counts.json")
+DEFAULT_CACHE_TTL = 900  # seconds
+
+def _load_pool_count_cache() -> Dict[str, List[float]]:
+    try:
+        with open(POOL_COUNT_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_pool_count_cache(cache: Dict[str, List[float]]):
+    try:
+        os.makedirs(os.path.dirname(POOL_COUNT_CACHE), exist_ok=True)
+        tmp_path = POOL_COUNT_CACHE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, POOL_COUNT_CACHE)
+    except OSError:
+        pass  # caching is best-effort
+
+def count_lhe_files_local(pool_name: str) -> int:
+    """Count .lhe files for a pool through a local (FUSE/bind) EOS mount"""
+    pool_path = os.path.join(EOS_PATH_BASE, "lhe_pools", pool_name)
+    try:
+        with os.scandir(pool_path) as it:
+            return sum(1 for entry in it if entry.name.endswith('.lhe'))
+    except OSError:
+        return 0
+
+def _scan_pool_counts(pool_names: List[str], scan_threads: int) -> Dict[str, int]:
+    """Count .lhe files for the given pools, cheapest available method first"""
+    if list_all_pools():
+        return {p: count_lhe_files_on_t2(p) for p in pool_names}
+
+    # Recursive listing unavailable: try all the per-pool probes over a
+    # single xrdfs session first, so the connection handshake is paid once.
+    counts = batch_probe_pools(pool_names)
+    if counts is not None:
+        return counts
+
+    # Last resort: one subprocess per pool, overlapping the network
+    # round-trips.  The probes are I/O-bound, so the GIL is released
+    # while each subprocess runs.
+    n_workers = max(1, min(scan_threads, len(pool_names)))
+    with _queued_logging(n_workers > 4), \
+            ThreadPoolExecutor(max_workers=n_workers) as executor:
+        return dict(zip(pool_names,
+                        executor.map(probe_pool_on_t2, pool_names)))
+
+def scan_existing_pools(required_pools: Sequence[str],
+                        scan_threads: int = DEFAULT_SCAN_THREADS,
+                        use_cache: bool = True,
+                        cache_ttl: int = DEFAULT_CACHE_TTL) -> Dict[str, str]:
+    """Scan the T2 lhe_pools area and report which pools already have LHE files.
+
+    Accepts any sequence of pool names (duplicates are scanned once, caller
+    order is preserved).  Returns a dict mapping pool name -> EOS path for
+    pools with at least one .lhe file; pools not in the result need to be
+    generated.  Counts are cached on disk for cache_ttl seconds so
+    back-to-back DAG regenerations do not re-scan the T2.
+    """
+    existing = {}
+
+    # Ordered tuple for iteration/status output, frozenset for O(1) membership
+    ordered_pools = tuple(dict.fromkeys(required_pools))
+    pool_set = frozenset(ordered_pools)
+
+    unknown_pools = pool_set - frozenset(LHE_POOLS)
+    if unknown_pools:
+        logger.warning("[WARNING] Undefined pool(s) requested: %s",
+                       ", ".join(sorted(unknown_pools)))
+
+    cache = _load_pool_count_cache() if use_cache else {}
+    now = time.time()
+    counts = {}
+    stale_pools = []
+    for pool_name in ordered_pools:
+        entry = cache.get(pool_name)
+        if entry and now - entry[1] < cache_ttl:
+            counts[pool_name] = int(entry[0])
+        else:
+            stale_pools.append(pool_name)
+
+    if stale_pools:
+        if os.path.isdir(os.path.join(EOS_PATH_BASE, "lhe_pools")):
+            # The EOS tree is locally mounted (FUSE/bind): plain directory
+            # listings are orders of magnitude cheaper than xrdfs round-trips
+            # and need no proxy
+            counts.update({p: count_lhe_files_local(p) for p in stale_pools})
+        elif check_proxy_valid():
+            counts.update(_scan_pool_counts(stale_pools, scan_threads))
+        else:
+            # Without a proxy the stale pools cannot be scanned, but any
+            # fresh cache entries collected above are still valid - the
+            # cache exists precisely to survive scan-less reruns
+            logger.warning("[WARNING] No valid VOMS proxy, skipping T2 pool scan")
+            logger.warning("          Run: voms-proxy-init -voms cms -valid 192:00")
+        if use_cache:
+            updated = False
+            for pool_name in stale_pools:
+                if pool_name in counts:
+                    cache[pool_name] = [counts[pool_name], now]
+                    updated = True
+            if updated:
+                _save_pool_count_cache(cache)
+
+    for pool_name in ordered_pools:
+        n_files = counts.get(pool_name)
+        if n_files is None:
+            logger.info("  [??] %s: not scanned (no valid proxy)", pool_name)
+        elif n_files > 0:
+            logger.info("  [OK] %s: %d LHE files on T2", pool_name, n_files)
+            existing[pool_name] = f"{EOS_PATH_BASE}/lhe_pools/{pool_name}"
+        else:
+            logger.info("  [--] %s: not found on T2", pool_name)
+
+    return existing
+
 # =============================================================================
 # DAG Generator Class
 # =============================================================================
 
+# Derived per-campaign state that is identical across DAG generations in the
+# same process (e.g. when a driver emits many DAG variants without re-exec)
+CampaignPlan = collections.namedtuple(
+    "CampaignPlan",
+    ["unique_pools", "usage_counts", "counter_template", "proc_tpl",
+     "resolved_inputs"])
+
+@functools.lru_cache(maxsize=None)
+def _campaign_plan(campaign_name: str) -> "CampaignPlan":
+    """Build (once per campaign) everything iter_campaign_dag derives.
+
+    Must be invalidated with _campaign_plan.cache_clear() whenever the pool
+    table changes, since resolved_inputs captures each pool's eos_path.
+    """
+    campaign = CAMPAIGNS[campaign_name]
+    # Counter preserves insertion order and replaces the O(len(inputs))
+    # list.count scans repeated inside the per-job loop; the Campaign caches
+    # it at construction
+    usage_counts = campaign.inputs_count
+    return CampaignPlan(
+        unique_pools=tuple(usage_counts),
+        usage_counts=usage_counts,
+        counter_template=dict.fromkeys(usage_counts, 0),
+        proc_tpl=DAGGenerator.processing_job_template(campaign),
+        resolved_inputs=tuple((name, LHE_POOLS[name], LHE_POOLS[name].eos_path)
+                              for name in campaign.inputs),
+    )
+
+def _gen_campaign_text(campaign_name: str, n_jobs: int,
+                       eos_base: str) -> Tuple[str, int, Dict[str, List[str]]]:
+    """Build one campaign's DAG block in isolation (process-pool worker).
+
+    Campaign blocks are independent string builders, so --campaign ALL can
+    fan them out across cores.  Runs on a throwaway DAGGenerator and returns
+    everything the parent needs to merge: the text, the job count for the
+    FINAL node decision, and any buffered itemdata lines.  Workers are
+    forked after main() resolves eos_path on LHE_POOLS, so they see the
+    same pool state as a serial run.
+    """
+    worker = DAGGenerator(BASE_DIR, eos_base)
+    text = "".join(worker.iter_campaign_dag(CAMPAIGNS[campaign_name], n_jobs))
+    return text, worker.job_counter, worker.items_files
+
+
+# Invariant DAG header, assembled once at import; per-generation only the
+# timestamp, campaign list and job count are formatted in
+_DAG_HEADER_TPL = ("# " + "=" * 70 + "\n"
+                   "# Full MC Production DAG\n"
+                   "# Generated: {ts}\n"
+                   "# Campaigns: {camps}\n"
+                   "# Jobs per campaign: {n}\n"
+                   "# " + "=" * 70 + "\n\n"
+                   "# DAG Configuration\nCONFIG dagman.config\n\n")
+
+
 class DAGGenerator:
     """Generate HTCondor DAGMan files for MC production"""
     
     def __init__(self, output_dir: str, eos_output: str = EOS_BASE):
         self.output_dir = output_dir
         self.eos_output = eos_output
-        self.dag_lines: List[str] = []
         self.sub_files: Dict[str, str] = {}
+        self.items_files: Dict[str, List[str]] = {}
         self.job_counter = 0
         
-    def generate_seed_list(self, n_jobs: int, start_seed: int = 100) -> List[int]:
-        """Generate list of random seeds for jobs"""
-        return list(range(start_seed, start_seed + n_jobs))
-    
-    def add_lhe_generation_jobs(self, pool: LHEPool, n_jobs: int, 
-                                 seeds: Optional[List[int]] = None) -> List[str]:
-        """Add LHE generation jobs to DAG"""
-        job_names = []
-        
+    def generate_seed_list(self, n_jobs: int, start_seed: int = 100) -> Iterable[int]:
+        """Generate the sequence of random seeds for jobs.
+
+        Returned as a bare range: the only consumer enumerates it, so there
+        is no reason to materialize n_jobs Python ints up front.
+        """
+        return range(start_seed, start_seed + n_jobs)
+
+    def lhe_job_names(self, pool: LHEPool, n_jobs: int) -> List[str]:
+        """Names of the LHE generation nodes iter_lhe_generation_jobs emits"""
+        if pool.eos_path:
+            return []
+        return [f"LHE_{pool.name}_{i}" for i in range(n_jobs)]
+
+    def iter_lhe_generation_jobs(self, pool: LHEPool, n_jobs: int,
+                                 seeds: Optional[Iterable[int]] = None) -> Iterator[str]:
+        """Yield DAG text for the LHE generation jobs of a pool"""
         if pool.eos_path:
             print(f"  [INFO] Pool {pool.name} already exists at {pool.eos_path}, skipping LHE generation")
-            return job_names
-            
+            return
+
         if seeds is None:
             seeds = self.generate_seed_list(n_jobs)
-            
-        for i, seed in enumerate(seeds):
-            job_name = f"LHE_{pool.name}_{i}"
-            job_names.append(job_name)
-            
-            # Add to DAG
-            self.dag_lines.append(f"JOB {job_name} processing/templates/lhe_gen.sub")
-            self.dag_lines.append(f'VARS {job_name} pool="{pool.name}" seed="{seed}" '
-                                  f'process="{pool.process}" '
-                                  f'min_pt_conia="{pool.min_pt_conia}" '
-                                  f'min_pt_bonia="{pool.min_pt_bonia}" '
-                                  f'min_pt_q="{pool.min_pt_q}"')
-            self.dag_lines.append(f"RETRY {job_name} 3")
-            
-        return job_names
-    
-    def add_processing_job(self, campaign: Campaign, job_id: int,
-                           lhe_files: List[str], parent_jobs: List[str]) -> str:
-        """Add a processing job (shower -> mix -> sim -> ntuple) to DAG"""
-        job_name = f"PROC_{campaign.name}_{job_id}"
-        
-        # Build input arguments
-        inputs_str = ",".join(lhe_files)
-        modes_str = ",".join(campaign.modes)
-        
-        # Add to DAG
-        self.dag_lines.append(f"JOB {job_name} processing/templates/processing.sub")
-        self.dag_lines.append(
-            f'VARS {job_name} campaign="{campaign.name}" '
-            f'job_id="{job_id}" '
-            f'inputs="{inputs_str}" '
-            f'modes="{modes_str}" '
-            f'analysis="{campaign.analysis_type}" '
-            f'n_sources="{campaign.n_sources}"'
+
+        # Only job_name and seed vary per iteration; bake the pool fields into
+        # one JOB/VARS/RETRY template so each job is a single substitution and
+        # a single chunk through the pipeline instead of three tiny ones.
+        # Positional %-formatting beats str.format for templates that repeat
+        # the same value several times.
+        lhe_tpl = ('JOB %s processing/templates/lhe_gen.sub\n'
+                   'VARS %s pool="' + pool.name + '" seed="%s" '
+                   'process="' + pool.process + '" '
+                   'min_pt_conia="' + str(pool.min_pt_conia) + '" '
+                   'min_pt_bonia="' + str(pool.min_pt_bonia) + '" '
+                   'min_pt_q="' + str(pool.min_pt_q) + '"\n'
+                   'RETRY %s 3\n')
+
+        # One list comprehension + join per pool keeps the per-seed work on
+        # CPython's C fast-path and hands the pipeline a single chunk for the
+        # whole block instead of one tiny yield per job
+        name_tpl = "LHE_" + pool.name + "_%d"
+        yield "".join([lhe_tpl % (job_name, job_name, seed, job_name)
+                       for job_name, seed in ((name_tpl % i, seed)
+                                              for i, seed in enumerate(seeds))])
+
+    @staticmethod
+    def processing_job_template(campaign: Campaign) -> str:
+        """JOB/VARS/RETRY template for a campaign's processing jobs.
+
+        All campaign-invariant fields are baked in once; each job substitutes
+        (job_name, job_name, job_id, inputs, job_name) positionally.
+        """
+        return (
+            'JOB %s processing/templates/processing.sub\n'
+            'VARS %s campaign="' + campaign.name + '" '
+            'job_id="%s" '
+            'inputs="%s" '
+            'modes="' + campaign.modes_str + '" '
+            'analysis="' + campaign.analysis_type + '" '
+            'n_sources="' + str(campaign.n_sources) + '"\n'
+            'RETRY %s 2\n'
         )
-        self.dag_lines.append(f"RETRY {job_name} 2")
-        
-        # Add dependencies
-        if parent_jobs:
-            parents = " ".join(parent_jobs)
-            self.dag_lines.append(f"PARENT {parents} CHILD {job_name}")
-            
-        return job_name
-    
-    def generate_campaign_dag(self, campaign: Campaign, n_jobs: int,
-                               use_existing_lhe: bool = True) -> List[str]:
-        """Generate DAG nodes for a complete campaign"""
-        self.dag_lines.append(f"\n# ============================================")
-        self.dag_lines.append(f"# Campaign: {campaign.name}")
-        self.dag_lines.append(f"# Description: {campaign.description}")
-        self.dag_lines.append(f"# ============================================")
-        
-        processing_jobs = []
-        
-        # Collect unique pools needed
-        unique_pools = list(set(campaign.inputs))
+
+    def queue_campaign_items(self, campaign_name: str, plan: "CampaignPlan",
+                             n_jobs: int) -> str:
+        """Build the itemdata lines backing a clusterized processing node.
+
+        One line per job: job_id first, then the inputs string.  HTCondor's
+        ``queue job_id, inputs from <file>`` assigns the remainder of each
+        line to the last variable, so the commas inside the inputs string
+        survive the split.  The lines are buffered on the generator and
+        flushed by write_dag, keeping --dry-run free of filesystem writes.
+        """
+        items_file = "%s.items" % campaign_name
+        counter_template = plan.counter_template
+        lines = []
+        for job_id in range(n_jobs):
+            counter = counter_template.copy()
+            lhe_files = []
+            for pool_name, _pool, _eos_path in plan.resolved_inputs:
+                usage_idx = counter[pool_name]
+                counter[pool_name] += 1
+                lhe_files.append(f"EOS:{pool_name}:{job_id}:{usage_idx}")
+            lines.append("%d, %s\n" % (job_id, ",".join(lhe_files)))
+        self.items_files[items_file] = lines
+        return items_file
+
+    def iter_campaign_dag(self, campaign: Campaign, n_jobs: int,
+                          use_existing_lhe: bool = True) -> Iterator[str]:
+        """Yield DAG text for a complete campaign"""
+        yield (f"\n# ============================================\n"
+               f"# Campaign: {campaign.name}\n"
+               f"# Description: {campaign.description}\n"
+               f"# ============================================\n")
+
+        # All campaign-derived state is memoized; repeated generations in the
+        # same process skip the derivation entirely
+        plan = _campaign_plan(campaign.name)
+        usage_counts = plan.usage_counts
+        unique_pools = plan.unique_pools
         pool_lhe_jobs: Dict[str, List[str]] = {}
-        
+
         # Stage 1: Generate LHE pools if needed
         for pool_name in unique_pools:
             pool = LHE_POOLS[pool_name]
-            
-            # Count how many times this pool is used
-            usage_count = campaign.inputs.count(pool_name)
-            jobs_per_pool = n_jobs * usage_count
-            
+
+            jobs_per_pool = n_jobs * usage_counts[pool_name]
+
             if use_existing_lhe and pool.eos_path:
                 pool_lhe_jobs[pool_name] = []  # No jobs needed
             else:
-                lhe_jobs = self.add_lhe_generation_jobs(pool, jobs_per_pool)
-                pool_lhe_jobs[pool_name] = lhe_jobs
+                yield from self.iter_lhe_generation_jobs(pool, jobs_per_pool)
+                pool_lhe_jobs[pool_name] = self.lhe_job_names(pool, jobs_per_pool)
                 
         # Stage 2: Generate processing jobs
+        # When every input pool already exists on EOS there are no PARENT
+        # edges, so the n_jobs identical nodes collapse into one clusterized
+        # node: the submit file queues from an itemdata file and DAGMan
+        # tracks a single cluster instead of n_jobs submissions
+        if use_existing_lhe and all(eos_path for _, _, eos_path in plan.resolved_inputs):
+            items_file = self.queue_campaign_items(campaign.name, plan, n_jobs)
+            job_name = "PROC_%s" % campaign.name
+            # No node-level RETRY here: a DAGMan retry of a multi-proc node
+            # resubmits the whole itemdata cluster, so one failed job would
+            # rerun all n_jobs week-long jobs.  Per-proc retries are handled
+            # by MaxRetries/OnExitHold/PeriodicRelease in the submit file.
+            yield (
+                'JOB %s processing/templates/processing_cluster.sub\n'
+                'VARS %s campaign="%s" modes="%s" analysis="%s" '
+                'n_sources="%d" itemfile="%s"\n'
+                % (job_name, job_name, campaign.name, campaign.modes_str,
+                   campaign.analysis_type, campaign.n_sources, items_file)
+            )
+            self.job_counter += n_jobs
+            return
+
+        # dict.copy() of the prebuilt zero template is the cheapest per-job
+        # reset; a dict-comp re-runs bytecode for every job
+        _counter_template = plan.counter_template
+        proc_tpl = plan.proc_tpl
+        resolved_inputs = plan.resolved_inputs
+        # Children sharing a parent set are grouped into one PARENT ... CHILD
+        # line after the job loop instead of one line per job; DAGMan parses
+        # each PARENT stanza individually, so fewer, wider edges are cheaper
+        edge_map: Dict[Tuple[str, ...], List[str]] = {}
         for job_id in range(n_jobs):
             # Determine LHE file sources for this job
             lhe_files = []
             parent_jobs = []
-            
-            pool_usage_counter = {p: 0 for p in unique_pools}
-            
-            for i, pool_name in enumerate(campaign.inputs):
-                pool = LHE_POOLS[pool_name]
+
+            pool_usage_counter = _counter_template.copy()
+
+            for i, (pool_name, pool, eos_path) in enumerate(resolved_inputs):
                 usage_idx = pool_usage_counter[pool_name]
                 pool_usage_counter[pool_name] += 1
-                
-                if pool.eos_path:
+
+                if eos_path:
                     # Use existing LHE from EOS (will be resolved at runtime)
                     lhe_files.append(f"EOS:{pool_name}:{job_id}:{usage_idx}")
                 else:
                     # Reference generated LHE
-                    lhe_job_idx = job_id * campaign.inputs.count(pool_name) + usage_idx
+                    lhe_job_idx = job_id * usage_counts[pool_name] + usage_idx
                     lhe_job_name = pool_lhe_jobs[pool_name][lhe_job_idx]
                     lhe_files.append(f"GEN:{pool_name}:{lhe_job_idx}")
                     parent_jobs.append(lhe_job_name)
                     
-            proc_job = self.add_processing_job(campaign, job_id, lhe_files, parent_jobs)
-            processing_jobs.append(proc_job)
-            
-        return processing_jobs
-    
-    def generate_full_dag(self, campaigns: List[str], n_jobs: int) -> str:
-        """Generate complete DAG file content"""
-        self.dag_lines = []
-        
-        # Header
-        self.dag_lines.append("# " + "=" * 70)
-        self.dag_lines.append("# Full MC Production DAG")
-        self.dag_lines.append(f"# Generated: {datetime.now().isoformat()}")
-        self.dag_lines.append(f"# Campaigns: {', '.join(campaigns)}")
-        self.dag_lines.append(f"# Jobs per campaign: {n_jobs}")
-        self.dag_lines.append("# " + "=" * 70)
-        self.dag_lines.append("")
-        
-        # DAG configuration
-        self.dag_lines.append("# DAG Configuration")
-        self.dag_lines.append("CONFIG dagman.config")
-        self.dag_lines.append("")
-        
-        # Generate each campaign
-        all_jobs = []
+            job_name = "PROC_%s_%d" % (campaign.name, job_id)
+            yield proc_tpl % (job_name, job_name, job_id, ",".join(lhe_files), job_name)
+            if parent_jobs:
+                edge_map.setdefault(tuple(parent_jobs), []).append(job_name)
+            self.job_counter += 1
+
+        for parents, children in edge_map.items():
+            yield "PARENT %s CHILD %s\n" % (" ".join(parents),
+                                            " ".join(children))
+
+    def iter_dag_lines(self, campaigns: List[str], n_jobs: int) -> Iterator[str]:
+        """Yield the complete DAG file content as a stream of text chunks.
+
+        Streaming keeps peak memory at O(one chunk) no matter how large the
+        campaign set is; write_dag feeds the iterator straight to writelines.
+        """
+        self.job_counter = 0
+
+        # Header and DAG configuration: one format call on the precomputed
+        # module-level template, the timestamp being the only dynamic part
+        # beyond the campaign list
+        yield _DAG_HEADER_TPL.format(ts=datetime.now().isoformat(),
+                                     camps=", ".join(campaigns),
+                                     n=n_jobs)
+
+        # Generate each campaign; multi-campaign runs fan out across cores
+        # since the work is bytecode-bound string building and the blocks
+        # are independent (map preserves campaign order)
+        valid = []
         for campaign_name in campaigns:
             if campaign_name not in CAMPAIGNS:
                 print(f"[WARNING] Unknown campaign: {campaign_name}, skipping")
                 continue
-            campaign = CAMPAIGNS[campaign_name]
-            jobs = self.generate_campaign_dag(campaign, n_jobs)
-            all_jobs.extend(jobs)
-            
+            valid.append(campaign_name)
+
+        # Workers must see the eos_path mutations main() applied to LHE_POOLS
+        # and the cleared plan cache; only the fork start method inherits
+        # them, so request it explicitly (spawn/forkserver would re-import
+        # the module with the static pool table and emit a wrong DAG) and
+        # fall back to serial generation where fork does not exist
+        fork_ctx = None
+        if len(valid) > 1:
+            try:
+                fork_ctx = multiprocessing.get_context("fork")
+            except ValueError:
+                print("[WARNING] fork start method unavailable, "
+                      "generating campaigns serially")
+
+        if fork_ctx is not None:
+            max_workers = min(len(valid), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=fork_ctx) as executor:
+                for text, job_count, items_files in executor.map(
+                        _gen_campaign_text, valid,
+                        itertools.repeat(n_jobs),
+                        itertools.repeat(self.eos_output)):
+                    self.job_counter += job_count
+                    self.items_files.update(items_files)
+                    yield text
+        else:
+            for campaign_name in valid:
+                yield from self.iter_campaign_dag(CAMPAIGNS[campaign_name], n_jobs)
+
         # Final summary node
-        if all_jobs:
-            self.dag_lines.append("\n# ============================================")
-            self.dag_lines.append("# Final Summary Node")
-            self.dag_lines.append("# ============================================")
-            self.dag_lines.append("FINAL SUMMARY processing/templates/summary.sub")
-            
-        return "\n".join(self.dag_lines)
+        if self.job_counter:
+            yield ("\n# ============================================\n"
+                   "# Final Summary Node\n"
+                   "# ============================================\n"
+                   "FINAL SUMMARY processing/templates/summary.sub\n")
+
+    def generate_full_dag(self, campaigns: List[str], n_jobs: int) -> str:
+        """Generate complete DAG file content as a single string"""
+        return "".join(self.iter_dag_lines(campaigns, n_jobs))
     
     def generate_dagman_config(self) -> str:
         """Generate DAGMan configuration file"""
@@ -389,15 +869,86 @@ DAGMAN_SUPPRESS_NOTIFICATION = True
 DAGMAN_GENERATE_RESCUE_DAG = True
 """
 
-    def write_dag(self, dag_content: str, filename: str):
-        """Write DAG file and associated configuration"""
+    def submit_direct(self, campaigns: List[str], n_jobs: int) -> bool:
+        """Submit processing jobs straight to the schedd via the htcondor bindings.
+
+        One Submit object plus an itemdata iterator gives a single RPC per
+        campaign, instead of DAGMan forking condor_submit once per node.
+        Only campaigns whose input pools all exist on EOS (i.e. no LHE
+        generation parents) can bypass the DAG; returns False when that does
+        not hold or the bindings are missing, so the caller falls back to
+        the DAG file.
+        """
+        if htcondor is None:
+            print("[ERROR] htcondor Python bindings not available, "
+                  "falling back to DAG generation")
+            return False
+
+        for campaign_name in campaigns:
+            campaign = CAMPAIGNS[campaign_name]
+            if not all(LHE_POOLS[p].eos_path for p in campaign.inputs):
+                print(f"[WARNING] Campaign {campaign_name} still needs LHE "
+                      f"generation; direct submit requires the DAG for dependencies")
+                return False
+
+        sub_path = os.path.join(BASE_DIR, "processing", "templates", "processing.sub")
+        with open(sub_path) as f:
+            submit = htcondor.Submit(f.read())
+        schedd = htcondor.Schedd()
+
+        for campaign_name in campaigns:
+            campaign = CAMPAIGNS[campaign_name]
+            plan = _campaign_plan(campaign_name)
+            itemdata = []
+            for job_id in range(n_jobs):
+                counter = plan.counter_template.copy()
+                lhe_files = []
+                for pool_name, _pool, _eos_path in plan.resolved_inputs:
+                    usage_idx = counter[pool_name]
+                    counter[pool_name] += 1
+                    lhe_files.append(f"EOS:{pool_name}:{job_id}:{usage_idx}")
+                itemdata.append({
+                    "campaign": campaign_name,
+                    "job_id": str(job_id),
+                    "inputs": ",".join(lhe_files),
+                    "modes": campaign.modes_str,
+                    "analysis": campaign.analysis_type,
+                    "n_sources": str(campaign.n_sources),
+                })
+
+            result = schedd.submit(submit, itemdata=iter(itemdata))
+            print(f"[OK] Submitted {n_jobs} {campaign_name} jobs "
+                  f"as cluster {result.cluster()}")
+        return True
+
+    def write_dag(self, dag_lines: Iterable[str], filename: str):
+        """Stream DAG content to disk and write the associated configuration"""
         dag_path = os.path.join(self.output_dir, filename)
-        
-        # Write DAG file
-        with open(dag_path, 'w') as f:
-            f.write(dag_content)
+
+        # Write DAG file: drain the generator pipeline into one reusable
+        # bytearray and flush it at 1 MiB boundaries.  Binary mode skips the
+        # TextIOWrapper layer, the chunks are pure ASCII, and the single
+        # mutable buffer avoids per-line str allocations ever reaching the
+        # allocator as long-lived objects
+        with open(dag_path, 'wb') as f:
+            buf = bytearray()
+            for chunk in dag_lines:
+                buf += chunk.encode('ascii')
+                if len(buf) >= 1 << 20:
+                    f.write(buf)
+                    del buf[:]
+            if buf:
+                f.write(buf)
         print(f"[OK] Generated DAG file: {dag_path}")
-        
+
+        # Flush itemdata files for clusterized nodes (populated during the
+        # iteration above)
+        for items_file, lines in self.items_files.items():
+            with open(os.path.join(self.output_dir, items_file), 'w') as f:
+                f.writelines(lines)
+            print(f"[OK] Generated itemdata file: {items_file}")
+
+
         # Write DAGMan config
         config_path = os.path.join(self.output_dir, "dagman.config")
         with open(config_path, 'w') as f:
@@ -417,14 +968,14 @@ def list_campaigns():
     for category in ["JJP", "JUP"]:
         print(f"\n{category} Campaigns:")
         print("-" * 40)
-        for name, campaign in CAMPAIGNS.items():
-            if campaign.analysis_type == category:
-                inputs = " + ".join(campaign.inputs)
-                modes = "/".join(campaign.modes)
-                print(f"  {name:15} : {campaign.description}")
-                print(f"                   Inputs: {inputs}")
-                print(f"                   Modes:  {modes}")
-                print()
+        for name in CAMPAIGNS_BY_TYPE[category]:
+            campaign = CAMPAIGNS[name]
+            inputs = " + ".join(campaign.inputs)
+            modes = "/".join(campaign.modes)
+            print(f"  {name:15} : {campaign.description}")
+            print(f"                   Inputs: {inputs}")
+            print(f"                   Modes:  {modes}")
+            print()
                 
 def list_pools():
     """Print available LHE pools"""
@@ -472,11 +1023,24 @@ Examples:
                         help="List available campaigns")
     parser.add_argument("--list-pools", action="store_true",
                         help="List available LHE pools")
+    parser.add_argument("--scan-threads", type=int, default=DEFAULT_SCAN_THREADS,
+                        help="Concurrent xrdfs probes for the T2 pool scan "
+                             "(default: {}, lower on rate-limited endpoints)".format(DEFAULT_SCAN_THREADS))
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore the on-disk pool-count cache and force a fresh T2 scan")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_CACHE_TTL,
+                        help="Pool-count cache lifetime in seconds (default: {})".format(DEFAULT_CACHE_TTL))
     parser.add_argument("--dry-run", action="store_true",
                         help="Print DAG content without writing files")
+    parser.add_argument("--direct-submit", action="store_true",
+                        help="Submit processing jobs via the htcondor bindings "
+                             "(one schedd RPC per campaign) when no LHE "
+                             "generation is needed, bypassing DAGMan")
     
     args = parser.parse_args()
-    
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     if args.list_campaigns:
         list_campaigns()
         return
@@ -491,11 +1055,11 @@ Examples:
         
     # Determine campaigns to generate
     if args.campaign == "ALL":
-        campaigns = list(CAMPAIGNS.keys())
+        campaigns = CAMPAIGNS_BY_TYPE["ALL"]
     elif args.campaign == "JJP_ALL":
-        campaigns = [c for c in CAMPAIGNS.keys() if c.startswith("JJP")]
+        campaigns = CAMPAIGNS_BY_TYPE["JJP"]
     elif args.campaign == "JUP_ALL":
-        campaigns = [c for c in CAMPAIGNS.keys() if c.startswith("JUP")]
+        campaigns = CAMPAIGNS_BY_TYPE["JUP"]
     elif args.campaign in CAMPAIGNS:
         campaigns = [args.campaign]
     else:
@@ -506,18 +1070,50 @@ Examples:
     print(f"\n[INFO] Generating DAG for campaigns: {', '.join(campaigns)}")
     print(f"[INFO] Jobs per campaign: {args.jobs}")
     print(f"[INFO] Output file: {args.output}")
-    
+
+    # Resolve which required pools already exist on the T2
+    required_pools = sorted(set(itertools.chain.from_iterable(
+        CAMPAIGNS[campaign_name].inputs for campaign_name in campaigns)))
+
+    print(f"\n[INFO] Required LHE pools: {', '.join(required_pools)}")
+    print("[INFO] Scanning T2 for existing LHE pools...")
+    existing_pools = scan_existing_pools(required_pools,
+                                         scan_threads=args.scan_threads,
+                                         use_cache=not args.no_cache,
+                                         cache_ttl=args.cache_ttl)
+
+    # Single pass: update eos_path and report in one lookup per pool
+    for pool_name in required_pools:
+        eos_path = existing_pools.get(pool_name)
+        if eos_path:
+            LHE_POOLS[pool_name].eos_path = eos_path
+            print(f"[OK] Pool {pool_name} found: {eos_path}")
+        elif not LHE_POOLS[pool_name].eos_path:
+            print(f"[INFO] Pool {pool_name} will be generated")
+
+    # Cached campaign plans capture eos_path, which may just have changed
+    _campaign_plan.cache_clear()
+
     # Generate DAG
     generator = DAGGenerator(args.output_dir)
-    dag_content = generator.generate_full_dag(campaigns, args.jobs)
-    
+
+    if args.direct_submit:
+        # A dry run must never reach the schedd
+        if args.dry_run:
+            print("[INFO] --dry-run suppresses --direct-submit; printing DAG instead")
+        elif generator.submit_direct(campaigns, args.jobs):
+            return
+        else:
+            print("[INFO] Falling back to DAG generation")
+
     if args.dry_run:
         print("\n" + "=" * 70)
         print("DAG Content (dry run):")
         print("=" * 70)
-        print(dag_content)
+        print(generator.generate_full_dag(campaigns, args.jobs))
     else:
-        generator.write_dag(dag_content, args.output)
+        generator.write_dag(generator.iter_dag_lines(campaigns, args.jobs),
+                            args.output)
         print(f"\n[OK] DAG generation complete!")
         print(f"[INFO] To submit: condor_submit_dag {os.path.join(args.output_dir, args.output)}")
 